@@ -172,6 +172,11 @@ class TraceContext(object):
                      Optional property.
     :type trace_tag: ``str``
     """
+    __slots__ = (
+        'id_',
+        'trace_tag'
+    )
+
     def __init__(self, id_=None, trace_tag=None):
         self.id_ = id_
         self.trace_tag = trace_tag
@@ -180,4 +185,30 @@ class TraceContext(object):
         return '{id_: %s, trace_tag: %s}' % (self.id_, self.trace_tag)
 
     def __json__(self):
-        return vars(self)
+        return self.to_dict()
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        # NOTE: Objects pickled before __slots__ was introduced (e.g. messages which are still
+        # waiting in the message bus queue) use instance __dict__ as state and objects pickled
+        # using the default __slots__ handling use (None, slots dict) tuple as state
+        if isinstance(state, tuple):
+            dict_state, slots_state = state
+            state = dict(dict_state or {})
+            state.update(slots_state or {})
+
+        for name in self.__slots__:
+            setattr(self, name, state.get(name, None))
+
+    def to_dict(self):
+        """
+        Return dictionary representation of this object.
+
+        :rtype: ``dict``
+        """
+        return {
+            'id_': self.id_,
+            'trace_tag': self.trace_tag
+        }
@@ -19,16 +19,23 @@ encrypted datastore values aka secrets).
 NOTE: In the past, this module used and relied on keyczar, but since keyczar doesn't support
 Python 3, we moved to cryptography library.
 
-symmetric_encrypt and symmetric_decrypt functions except values as returned by the AESKey.Encrypt()
-and AESKey.Decrypt() methods in keyczar. Those functions follow the same approach (AES in CBC mode
-with SHA1 HMAC signature) as keyczar methods, but they use and rely on primitives and methods from
-the cryptography library.
-
-This was done to make the keyczar -> cryptography migration fully backward compatible.
-
-Eventually, we should  move to Fernet (https://cryptography.io/en/latest/fernet/) recipe for
-symmetric encryption / decryption, because it offers more robustness and safer defaults (SHA256
-instead of SHA1, etc.).
+symmetric_encrypt encrypts values using AES in GCM mode (authenticated encryption which doesn't
+require a separate HMAC signature). symmetric_decrypt dispatches on the ciphertext prefix, so in
+addition to AES-GCM values, it also accepts values as returned by the AESKey.Encrypt() method in
+keyczar (AES in CBC mode with SHA1 HMAC signature). Those are decrypted using primitives and
+methods from the cryptography library which makes the keyczar -> cryptography migration fully
+backward compatible.
+
+cryptography_symmetric_encrypt still uses keyczar style message layout (AES in CBC mode), but it
+signs the message using SHA256 HMAC instead of SHA1 HMAC. Values signed using SHA1 HMAC can only be
+decrypted, they are never produced anymore.
+
+Migration path: Originally, the plan was to move to the Fernet
+(https://cryptography.io/en/latest/fernet/) recipe for symmetric encryption / decryption since it
+offers safer defaults (SHA256 instead of SHA1, etc.). AES-GCM used by symmetric_encrypt offers the
+same guarantees (authenticated encryption) with a single pass over the data. Existing values are
+re-encrypted in the new format when they are written again (e.g. "st2 key set"). Once all the
+values have been re-encrypted, keyczar compatible decryption code can be removed.
 """
 
 from __future__ import absolute_import
@@ -38,13 +45,15 @@ import json
 import binascii
 import base64
 
-from hashlib import sha1
-
 import six
 
+from hashlib import sha1
+from hashlib import sha256
+
 from cryptography.hazmat.primitives.ciphers import Cipher
 from cryptography.hazmat.primitives.ciphers import algorithms
 from cryptography.hazmat.primitives.ciphers import modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives import hmac
 from cryptography.hazmat.backends import default_backend
@@ -54,6 +63,11 @@ __all__ = [
     'KEYCZAR_AES_BLOCK_SIZE',
     'KEYCZAR_HLEN',
 
+    'HMAC_SHA256_CIPHERTEXT_PREFIX',
+    'HMAC_SHA256_HLEN',
+    'AES_GCM_CIPHERTEXT_PREFIX',
+    'AES_GCM_NONCE_SIZE',
+
     'read_crypto_key',
 
     'symmetric_encrypt',
@@ -62,9 +76,8 @@ __all__ = [
     'cryptography_symmetric_encrypt',
     'cryptography_symmetric_decrypt',
 
-    # NOTE: Keyczar functions are here for testing reasons - they are only used by tests
-    'keyczar_symmetric_encrypt',
-    'keyczar_symmetric_decrypt',
+    'cryptography_symmetric_encrypt_v2',
+    'cryptography_symmetric_decrypt_v2',
 
     'AESKey'
 ]
@@ -74,6 +87,24 @@ KEYCZAR_HEADER_SIZE = 5
 KEYCZAR_AES_BLOCK_SIZE = 16
 KEYCZAR_HLEN = sha1().digest_size
 
+# NOTE: Ciphertexts without one of the prefixes below are legacy hex encoded (keyczar compatible)
+# ciphertexts. Prefixes can't be confused with hex notation since "S" and "G" are not valid hex
+# characters.
+
+# Prefix (version byte) which is used for base64 encoded keyczar style ciphertexts which are signed
+# using SHA256 HMAC instead of SHA1 HMAC
+HMAC_SHA256_CIPHERTEXT_PREFIX = b'S'
+HMAC_SHA256_HLEN = sha256().digest_size
+
+# Prefix (version byte) which is used for base64 encoded AES-GCM ciphertexts
+AES_GCM_CIPHERTEXT_PREFIX = b'G'
+
+# Nonce size recommended for AES-GCM
+AES_GCM_NONCE_SIZE = 12
+
+# Authentication tag size used by AES-GCM
+AES_GCM_TAG_SIZE = 16
+
 # Minimum key size which can be used for symmetric crypto
 MINIMUM_AES_KEY_SIZE = 128
 
@@ -81,6 +112,14 @@ DEFAULT_AES_KEY_SIZE = 256
 
 assert DEFAULT_AES_KEY_SIZE >= MINIMUM_AES_KEY_SIZE
 
+# default_backend() always returns the same backend instance and hash algorithm instances are
+# stateless so we create them once and re-use them
+_BACKEND = default_backend()
+_HASH_ALGORITHMS = {
+    'sha1': hashes.SHA1(),
+    'sha256': hashes.SHA256()
+}
+
 
 class AESKey(object):
     """
@@ -112,8 +151,19 @@ class AESKey(object):
         self.hmac_key_bytes = Base64WSDecode(self.hmac_key_string)
         self.aes_key_bytes = Base64WSDecode(self.aes_key_string)
 
+        # Key objects are immutable so we create them once (on first use) and re-use them for every
+        # encrypt and decrypt operation. HMAC contexts are never updated directly, we only use
+        # copies of them.
+        # NOTE: They are created lazily since most of the AESKey objects are only used for a single
+        # decrypt operation (e.g. decrypt_kv Jinja filter calls read_crypto_key() each time) which
+        # only needs one of them.
+        self._aes_algorithm = None
+        self._aes_gcm = None
+        # Maps hash name to the HMAC context for that hash
+        self._hmac_templates = {}
+
     @classmethod
-    def generate(self, key_size=DEFAULT_AES_KEY_SIZE):
+    def generate(cls, key_size=DEFAULT_AES_KEY_SIZE):
         """
         Generate a new AES key with the corresponding HMAC key.
 
@@ -122,14 +172,56 @@ class AESKey(object):
         if key_size < MINIMUM_AES_KEY_SIZE:
             raise ValueError('Unsafe key size: %s' % (key_size))
 
-        aes_key_bytes = os.urandom(int(key_size / 8))
+        key_size_bytes = key_size // 8
+
+        aes_key_bytes = os.urandom(key_size_bytes)
         aes_key_string = Base64WSEncode(aes_key_bytes)
 
-        hmac_key_bytes = os.urandom(int(key_size / 8))
+        hmac_key_bytes = os.urandom(key_size_bytes)
         hmac_key_string = Base64WSEncode(hmac_key_bytes)
 
-        return AESKey(aes_key_string=aes_key_string, hmac_key_string=hmac_key_string,
-                      hmac_key_size=key_size, mode='CBC', size=key_size)
+        return cls(aes_key_string=aes_key_string, hmac_key_string=hmac_key_string,
+                   hmac_key_size=key_size, mode='CBC', size=key_size)
+
+    def get_cbc_cipher(self, iv_bytes):
+        """
+        Return AES CBC mode cipher for this key and the provided IV.
+
+        :rtype: :class:`cryptography.hazmat.primitives.ciphers.Cipher`
+        """
+        if self._aes_algorithm is None:
+            self._aes_algorithm = algorithms.AES(self.aes_key_bytes)
+
+        return Cipher(self._aes_algorithm, modes.CBC(iv_bytes), backend=_BACKEND)
+
+    def get_gcm_cipher(self):
+        """
+        Return AES GCM mode cipher for this key.
+
+        :rtype: :class:`cryptography.hazmat.primitives.ciphers.aead.AESGCM`
+        """
+        if self._aes_gcm is None:
+            self._aes_gcm = AESGCM(self.aes_key_bytes)
+
+        return self._aes_gcm
+
+    def get_hmac(self, hash_name='sha1'):
+        """
+        Return new HMAC context for this key which is ready to be updated.
+
+        :param hash_name: Name of the hash algorithm to use (sha1, sha256).
+        :type hash_name: ``str``
+
+        :rtype: :class:`cryptography.hazmat.primitives.hmac.HMAC`
+        """
+        hmac_template = self._hmac_templates.get(hash_name, None)
+
+        if hmac_template is None:
+            hmac_template = hmac.HMAC(self.hmac_key_bytes, _HASH_ALGORITHMS[hash_name],
+                                      backend=_BACKEND)
+            self._hmac_templates[hash_name] = hmac_template
+
+        return hmac_template.copy()
 
     def to_json(self):
         """
@@ -182,10 +274,17 @@ def read_crypto_key(key_path):
 
 
 def symmetric_encrypt(encrypt_key, plaintext):
-    return cryptography_symmetric_encrypt(encrypt_key=encrypt_key, plaintext=plaintext)
+    return cryptography_symmetric_encrypt_v2(encrypt_key=encrypt_key, plaintext=plaintext)
 
 
 def symmetric_decrypt(decrypt_key, ciphertext):
+    if isinstance(ciphertext, six.text_type):
+        ciphertext = ciphertext.encode('utf-8')
+
+    # Values which have been encrypted before AES-GCM was introduced use keyczar compatible format
+    if ciphertext[:1] == AES_GCM_CIPHERTEXT_PREFIX:
+        return cryptography_symmetric_decrypt_v2(decrypt_key=decrypt_key, ciphertext=ciphertext)
+
     return cryptography_symmetric_decrypt(decrypt_key=decrypt_key, ciphertext=ciphertext)
 
 
@@ -193,21 +292,23 @@ def cryptography_symmetric_encrypt(encrypt_key, plaintext):
     """
     Encrypt the provided plaintext using AES encryption.
 
-    NOTE 1: This function return a string which is fully compatible with Keyczar.Encrypt() method.
-
-    NOTE 2: This function is loosely based on keyczar AESKey.Encrypt() (Apache 2.0 license).
+    NOTE 1: This function is loosely based on keyczar AESKey.Encrypt() (Apache 2.0 license).
 
     The final encrypted string value consists of:
 
-    [message bytes][HMAC signature bytes for the message] where message consists of
-    [keyczar header plaintext][IV bytes][ciphertext bytes]
+    [SHA256 HMAC prefix][base64 encoded message bytes + SHA256 HMAC signature bytes for the
+    message] where message consists of [keyczar header plaintext][IV bytes][ciphertext bytes]
+
+    NOTE 2: Header itself is unused, but it's added so the format is compatible with keyczar format.
 
-    NOTE: Header itself is unused, but it's added so the format is compatible with keyczar format.
+    NOTE 3: In the past, the result was hex encoded and signed using SHA1 HMAC (same as
+    Keyczar.Encrypt() result). Those values can still be decrypted by
+    cryptography_symmetric_decrypt().
 
     """
     assert isinstance(encrypt_key, AESKey), 'encrypt_key needs to be AESKey class instance'
-    assert isinstance(plaintext, (six.text_type, six.string_types, six.binary_type)), \
-        'plaintext needs to either be a string/unicode or bytes'
+    assert isinstance(plaintext, (six.text_type, six.binary_type)), \
+        'plaintext needs to either be a string or bytes'
 
     aes_key_bytes = encrypt_key.aes_key_bytes
     hmac_key_bytes = encrypt_key.hmac_key_bytes
@@ -215,7 +316,7 @@ def cryptography_symmetric_encrypt(encrypt_key, plaintext):
     assert isinstance(aes_key_bytes, six.binary_type)
     assert isinstance(hmac_key_bytes, six.binary_type)
 
-    if isinstance(plaintext, (six.text_type, six.string_types)):
+    if isinstance(plaintext, six.text_type):
         # Convert data to bytes
         data = plaintext.encode('utf-8')
     else:
@@ -227,8 +328,7 @@ def cryptography_symmetric_encrypt(encrypt_key, plaintext):
     # Generate IV
     iv_bytes = os.urandom(KEYCZAR_AES_BLOCK_SIZE)
 
-    backend = default_backend()
-    cipher = Cipher(algorithms.AES(aes_key_bytes), modes.CBC(iv_bytes), backend=backend)
+    cipher = encrypt_key.get_cbc_cipher(iv_bytes)
     encryptor = cipher.encryptor()
 
     # NOTE: We don't care about actual Keyczar header value, we only care about the length (5
@@ -239,32 +339,34 @@ def cryptography_symmetric_encrypt(encrypt_key, plaintext):
     msg_bytes = header_bytes + iv_bytes + ciphertext_bytes
 
     # Generate HMAC signature for the message (header + IV + ciphertext)
-    h = hmac.HMAC(hmac_key_bytes, hashes.SHA1(), backend=backend)
+    h = encrypt_key.get_hmac(hash_name='sha256')
     h.update(msg_bytes)
     sig_bytes = h.finalize()
 
     result = msg_bytes + sig_bytes
 
-    # Convert resulting byte string to hex notation ASCII string
-    result = binascii.hexlify(result).upper()
+    # Convert resulting byte string to base64 notation ASCII string
+    result = HMAC_SHA256_CIPHERTEXT_PREFIX + base64.b64encode(result)
 
     return result
 
 
 def cryptography_symmetric_decrypt(decrypt_key, ciphertext):
     """
-    Decrypt the provided ciphertext which has been encrypted using symmetric_encrypt() method (it
-    assumes input is in hex notation as returned by binascii.hexlify).
+    Decrypt the provided ciphertext which has been encrypted using
+    cryptography_symmetric_encrypt() method (it assumes input is either in prefixed base64 notation
+    or in legacy hex notation as returned by binascii.hexlify).
 
-    NOTE 1: This function assumes ciphertext has been encrypted using symmetric AES crypto from
-    keyczar library. Underneath it uses crypto primitives from cryptography library which is Python
-    3 compatible.
+    NOTE 1: Legacy hex encoded ciphertexts use the same format as the one produced by symmetric
+    AES crypto from keyczar library (signed using SHA1 HMAC), so values encrypted using keyczar can
+    also be decrypted. Underneath it uses crypto primitives from cryptography library which is
+    Python 3 compatible.
 
     NOTE 2: This function is loosely based on keyczar AESKey.Decrypt() (Apache 2.0 license).
     """
     assert isinstance(decrypt_key, AESKey), 'decrypt_key needs to be AESKey class instance'
-    assert isinstance(ciphertext, (six.text_type, six.string_types, six.binary_type)), \
-        'ciphertext needs to either be a string/unicode or bytes'
+    assert isinstance(ciphertext, (six.text_type, six.binary_type)), \
+        'ciphertext needs to either be a string or bytes'
 
     aes_key_bytes = decrypt_key.aes_key_bytes
     hmac_key_bytes = decrypt_key.hmac_key_bytes
@@ -272,104 +374,131 @@ def cryptography_symmetric_decrypt(decrypt_key, ciphertext):
     assert isinstance(aes_key_bytes, six.binary_type)
     assert isinstance(hmac_key_bytes, six.binary_type)
 
-    # Convert from hex notation ASCII string to bytes
-    ciphertext = binascii.unhexlify(ciphertext)
+    if isinstance(ciphertext, six.text_type):
+        ciphertext = ciphertext.encode('utf-8')
+
+    # Convert from base64 or legacy hex notation ASCII string to bytes. Legacy format is signed
+    # using SHA1 HMAC
+    if ciphertext[:1] == HMAC_SHA256_CIPHERTEXT_PREFIX:
+        ciphertext = base64.b64decode(ciphertext[1:])
+        hash_name = 'sha256'
+        hlen = HMAC_SHA256_HLEN
+    else:
+        ciphertext = binascii.unhexlify(ciphertext)
+        hash_name = 'sha1'
+        hlen = KEYCZAR_HLEN
+
+    # NOTE: We use memoryview so slicing below doesn't copy the underlying data
+    ciphertext = memoryview(ciphertext)
 
     data_bytes = ciphertext[KEYCZAR_HEADER_SIZE:]  # remove header
 
     # Verify ciphertext contains IV + HMAC signature
-    if len(data_bytes) < (KEYCZAR_AES_BLOCK_SIZE + KEYCZAR_HLEN):
+    if len(data_bytes) < (KEYCZAR_AES_BLOCK_SIZE + hlen):
         raise ValueError('Invalid or malformed ciphertext (too short)')
 
     iv_bytes = data_bytes[:KEYCZAR_AES_BLOCK_SIZE]  # first block is IV
-    ciphertext_bytes = data_bytes[KEYCZAR_AES_BLOCK_SIZE:-KEYCZAR_HLEN]  # strip IV and signature
-    signature_bytes = data_bytes[-KEYCZAR_HLEN:]  # last 20 bytes are signature
+    ciphertext_bytes = data_bytes[KEYCZAR_AES_BLOCK_SIZE:-hlen]  # strip IV and signature
+    signature_bytes = data_bytes[-hlen:]  # last 20 or 32 bytes are signature
 
     # Verify HMAC signature
-    backend = default_backend()
-    h = hmac.HMAC(hmac_key_bytes, hashes.SHA1(), backend=backend)
-    h.update(ciphertext[:-KEYCZAR_HLEN])
-    h.verify(signature_bytes)
+    h = decrypt_key.get_hmac(hash_name=hash_name)
+    h.update(ciphertext[:-hlen])
+    h.verify(signature_bytes.tobytes())
 
     # Decrypt ciphertext
-    cipher = Cipher(algorithms.AES(aes_key_bytes), modes.CBC(iv_bytes), backend=backend)
+    cipher = decrypt_key.get_cbc_cipher(iv_bytes.tobytes())
 
     decryptor = cipher.decryptor()
     decrypted = decryptor.update(ciphertext_bytes) + decryptor.finalize()
 
     # Unpad
     decrypted = pkcs5_unpad(decrypted)
-    return decrypted
+    return decrypted.decode('utf-8')
 
-###
-# NOTE: Those methods below are deprecated and only used for testing purposes
-##
 
-
-def keyczar_symmetric_encrypt(encrypt_key, plaintext):
+def cryptography_symmetric_encrypt_v2(encrypt_key, plaintext):
     """
-    Encrypt the given message using the encrypt_key. Returns a UTF-8 str
-    ready to be stored in database. Note that we convert the hex notation
-    to a ASCII notation to produce a UTF-8 friendly string.
+    Encrypt the provided plaintext using AES in GCM mode.
 
-    Also, this method will not return the same output on multiple invocations
-    of same method. The reason is that the Encrypt method uses a different
-    'Initialization Vector' per run and the IV is part of the output.
+    GCM is an authenticated encryption mode which means that unlike in the keyczar compatible
+    format, separate HMAC signature is not needed. Authentication tag is computed by OpenSSL as
+    part of the same pass over the data (using hardware accelerated GHASH where available).
 
-    :param encrypt_key: Symmetric AES key to use for encryption.
-    :type encrypt_key: :class:`AESKey`
+    NOTE: AES-GCM is used instead of ChaCha20-Poly1305 since it's faster on CPUs with AES-NI
+    support and it works with existing AES keys.
 
-    :param plaintext: Plaintext / message to be encrypted.
-    :type plaintext: ``str``
+    The final encrypted string value consists of:
 
-    :rtype: ``str``
+    [AES-GCM prefix][base64 encoded nonce bytes + ciphertext bytes + authentication tag bytes]
     """
-    from keyczar.keys import AesKey as KeyczarAesKey
-    from keyczar.keys import HmacKey as KeyczarHmacKey
-    from keyczar.keyinfo import GetMode
+    assert isinstance(encrypt_key, AESKey), 'encrypt_key needs to be AESKey class instance'
+    assert isinstance(plaintext, (six.text_type, six.binary_type)), \
+        'plaintext needs to either be a string or bytes'
 
-    encrypt_key = KeyczarAesKey(encrypt_key.aes_key_string,
-                                KeyczarHmacKey(encrypt_key.hmac_key_string,
-                                               encrypt_key.hmac_key_size),
-                                encrypt_key.size,
-                                GetMode(encrypt_key.mode))
+    aes_key_bytes = encrypt_key.aes_key_bytes
 
-    return binascii.hexlify(encrypt_key.Encrypt(plaintext)).upper()
+    assert isinstance(aes_key_bytes, six.binary_type)
+
+    if isinstance(plaintext, six.text_type):
+        # Convert data to bytes
+        data = plaintext.encode('utf-8')
+    else:
+        data = plaintext
 
+    # Generate nonce. Nonce must never be re-used with the same key
+    nonce_bytes = os.urandom(AES_GCM_NONCE_SIZE)
 
-def keyczar_symmetric_decrypt(decrypt_key, ciphertext):
-    """
-    Decrypt the given crypto text into plain text. Returns the original
-    string input. Note that we first convert the string to hex notation
-    and then decrypt. This is reverse of the encrypt operation.
+    # NOTE: Returned ciphertext bytes already include authentication tag
+    ciphertext_bytes = encrypt_key.get_gcm_cipher().encrypt(nonce_bytes, data, None)
+
+    result = AES_GCM_CIPHERTEXT_PREFIX + base64.b64encode(nonce_bytes + ciphertext_bytes)
+    return result
 
-    :param decrypt_key: Symmetric AES key to use for decryption.
-    :type decrypt_key: :class:`keyczar.keys.AESKey`
 
-    :param crypto: Crypto text to be decrypted.
-    :type crypto: ``str``
+def cryptography_symmetric_decrypt_v2(decrypt_key, ciphertext):
+    """
+    Decrypt the provided ciphertext which has been encrypted using
+    cryptography_symmetric_encrypt_v2() method.
 
-    :rtype: ``str``
+    :raises: :class:`cryptography.exceptions.InvalidTag` if the ciphertext has been tampered
+             with.
     """
-    from keyczar.keys import AesKey as KeyczarAesKey
-    from keyczar.keys import HmacKey as KeyczarHmacKey
-    from keyczar.keyinfo import GetMode
+    assert isinstance(decrypt_key, AESKey), 'decrypt_key needs to be AESKey class instance'
+    assert isinstance(ciphertext, (six.text_type, six.binary_type)), \
+        'ciphertext needs to either be a string or bytes'
 
-    decrypt_key = KeyczarAesKey(decrypt_key.aes_key_string,
-                                KeyczarHmacKey(decrypt_key.hmac_key_string,
-                                               decrypt_key.hmac_key_size),
-                                decrypt_key.size,
-                                GetMode(decrypt_key.mode))
+    aes_key_bytes = decrypt_key.aes_key_bytes
 
-    return decrypt_key.Decrypt(binascii.unhexlify(ciphertext))
+    assert isinstance(aes_key_bytes, six.binary_type)
+
+    if isinstance(ciphertext, six.text_type):
+        ciphertext = ciphertext.encode('utf-8')
+
+    if ciphertext[:1] != AES_GCM_CIPHERTEXT_PREFIX:
+        raise ValueError('Invalid or malformed ciphertext (unsupported format)')
+
+    data_bytes = base64.b64decode(ciphertext[1:])
+
+    # Verify ciphertext contains nonce + authentication tag
+    if len(data_bytes) < (AES_GCM_NONCE_SIZE + AES_GCM_TAG_SIZE):
+        raise ValueError('Invalid or malformed ciphertext (too short)')
+
+    nonce_bytes = data_bytes[:AES_GCM_NONCE_SIZE]
+    ciphertext_bytes = data_bytes[AES_GCM_NONCE_SIZE:]
+
+    # Decrypt and verify authentication tag
+    decrypted = decrypt_key.get_gcm_cipher().decrypt(nonce_bytes, ciphertext_bytes, None)
+    return decrypted.decode('utf-8')
 
 
 def pkcs5_pad(data):
     """
     Pad data using PKCS5
     """
-    pad = KEYCZAR_AES_BLOCK_SIZE - len(data) % KEYCZAR_AES_BLOCK_SIZE
-    data = data + pad * chr(pad).encode('utf-8')
+    # NOTE: Block size is a power of two so we can use a bitmask instead of modulo
+    pad = KEYCZAR_AES_BLOCK_SIZE - (len(data) & (KEYCZAR_AES_BLOCK_SIZE - 1))
+    data = data + six.int2byte(pad) * pad
     return data
 
 
@@ -377,12 +506,8 @@ def pkcs5_unpad(data):
     """
     Unpad data padded using PKCS5.
     """
-    if isinstance(data, six.binary_type):
-        # Make sure we are operating with a string type
-        data = data.decode('utf-8')
-
-    pad = ord(data[-1])
-    data = data[:-pad]
+    # NOTE: Last byte contains the padding length
+    data = data[:-six.indexbytes(data, -1)]
     return data
 
 
@@ -391,21 +516,21 @@ def Base64WSEncode(s):
     Return Base64 web safe encoding of s. Suppress padding characters (=).
 
     Uses URL-safe alphabet: - replaces +, _ replaces /. Will convert s of type
-    unicode to string type first.
+    unicode to bytes first.
 
-    @param s: string to encode as Base64
+    @param s: string or bytes to encode as Base64
     @type s: string
 
     @return: Base64 representation of s.
     @rtype: string
 
-    NOTE: Taken from keyczar (Apache 2.0 license)
+    NOTE: Based on keyczar (Apache 2.0 license)
     """
     if isinstance(s, six.text_type):
         # Make sure input string is always converted to bytes (if not already)
         s = s.encode('utf-8')
 
-    return base64.urlsafe_b64encode(s).decode('utf-8').replace("=", "")
+    return base64.urlsafe_b64encode(s).rstrip(b'=').decode('utf-8')
 
 
 def Base64WSDecode(s):
@@ -413,32 +538,30 @@ def Base64WSDecode(s):
     Return decoded version of given Base64 string. Ignore whitespace.
 
     Uses URL-safe alphabet: - replaces +, _ replaces /. Will convert s of type
-    unicode to string type first.
+    unicode to bytes first.
 
-    @param s: Base64 string to decode
+    @param s: Base64 string or bytes to decode
     @type s: string
 
-    @return: original string that was encoded as Base64
-    @rtype: string
+    @return: original bytes that were encoded as Base64
+    @rtype: bytes
 
-    @raise Base64DecodingError: If length of string (ignoring whitespace) is one
+    @raise ValueError: If length of string (ignoring whitespace) is one
       more than a multiple of four.
 
-    NOTE: Taken from keyczar (Apache 2.0 license)
+    NOTE: Based on keyczar (Apache 2.0 license)
     """
-    s = ''.join(s.splitlines())
-    s = str(s.replace(" ", ""))  # kill whitespace, make string (not unicode)
-    d = len(s) % 4
+    if isinstance(s, six.text_type):
+        s = s.encode('utf-8')
+
+    # Kill whitespace
+    s = s.translate(None, b' \t\r\n')
 
-    if d == 1:
+    if len(s) % 4 == 1:
         raise ValueError('Base64 decoding errors')
-    elif d == 2:
-        s += "=="
-    elif d == 3:
-        s += "="
 
     try:
-        return base64.urlsafe_b64decode(s)
-    except TypeError as e:
-        # Decoding raises TypeError if s contains invalid characters.
+        # Add back padding which has been suppressed by Base64WSEncode
+        return base64.urlsafe_b64decode(s + b'=' * (-len(s) % 4))
+    except (TypeError, binascii.Error) as e:
         raise ValueError('Base64 decoding error: %s' % (six.text_type(e)))
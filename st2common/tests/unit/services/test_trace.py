@@ -15,9 +15,11 @@
 from __future__ import absolute_import
 
 import copy
+import pickle
 from collections import OrderedDict
 
 import bson
+from six.moves import copyreg
 from unittest2 import TestCase
 
 from st2common.exceptions.db import StackStormDBObjectNotFoundError
@@ -459,6 +461,18 @@ class TestTraceService(DbTestCase):
         self.assertEqual(trace_component, expected)
 
 
+class PickledTraceContext(object):
+    """
+    Object which pickles to TraceContext with the provided state.
+    """
+
+    def __init__(self, state):
+        self.state = state
+
+    def __reduce__(self):
+        return (copyreg._reconstructor, (TraceContext, object, None), self.state)
+
+
 class TestTraceContext(TestCase):
 
     def test_str_method(self):
@@ -470,3 +484,31 @@ class TestTraceContext(TestCase):
 
         trace_context = TraceContext(id_='id')
         self.assertTrue(str(trace_context))
+
+    def test_to_dict_method(self):
+        trace_context = TraceContext(id_='id', trace_tag='tag')
+        self.assertEqual(trace_context.to_dict(), {'id_': 'id', 'trace_tag': 'tag'})
+        self.assertEqual(trace_context.__json__(), {'id_': 'id', 'trace_tag': 'tag'})
+
+        trace_context = TraceContext(trace_tag='tag')
+        self.assertEqual(trace_context.to_dict(), {'id_': None, 'trace_tag': 'tag'})
+
+    def test_pickle_and_unpickle(self):
+        trace_context = TraceContext(id_='id', trace_tag='tag')
+
+        for protocol in range(0, pickle.HIGHEST_PROTOCOL + 1):
+            result = pickle.loads(pickle.dumps(trace_context, protocol=protocol))
+            self.assertEqual(result.to_dict(), {'id_': 'id', 'trace_tag': 'tag'})
+
+    def test_unpickle_dict_and_slots_state(self):
+        # Objects pickled before __slots__ was introduced use instance __dict__ as state
+        result = pickle.loads(pickle.dumps(PickledTraceContext({'id_': 'id', 'trace_tag': 'tag'})))
+        self.assertEqual(result.to_dict(), {'id_': 'id', 'trace_tag': 'tag'})
+
+        result = pickle.loads(pickle.dumps(PickledTraceContext({'trace_tag': 'tag'})))
+        self.assertEqual(result.to_dict(), {'id_': None, 'trace_tag': 'tag'})
+
+        # Objects pickled using default __slots__ handling use (None, slots dict) tuple as state
+        state = (None, {'id_': 'id', 'trace_tag': 'tag'})
+        result = pickle.loads(pickle.dumps(PickledTraceContext(state)))
+        self.assertEqual(result.to_dict(), {'id_': 'id', 'trace_tag': 'tag'})
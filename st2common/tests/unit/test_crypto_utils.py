@@ -19,26 +19,43 @@ from __future__ import absolute_import
 import os
 
 import six
+import mock
 import json
-import binascii
+import base64
 
 import unittest2
 from unittest2 import TestCase
 from six.moves import range
 from cryptography.exceptions import InvalidSignature
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hmac
+from cryptography.hazmat.primitives.ciphers import algorithms
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
+from st2common.util import crypto
 from st2common.util.crypto import KEYCZAR_HEADER_SIZE
+from st2common.util.crypto import HMAC_SHA256_CIPHERTEXT_PREFIX
+from st2common.util.crypto import HMAC_SHA256_HLEN
+from st2common.util.crypto import AES_GCM_CIPHERTEXT_PREFIX
+from st2common.util.crypto import AES_GCM_NONCE_SIZE
 from st2common.util.crypto import AESKey
 from st2common.util.crypto import read_crypto_key
 from st2common.util.crypto import symmetric_encrypt
 from st2common.util.crypto import symmetric_decrypt
-from st2common.util.crypto import keyczar_symmetric_decrypt
-from st2common.util.crypto import keyczar_symmetric_encrypt
 from st2common.util.crypto import cryptography_symmetric_encrypt
 from st2common.util.crypto import cryptography_symmetric_decrypt
+from st2common.util.crypto import cryptography_symmetric_encrypt_v2
+from st2common.util.crypto import cryptography_symmetric_decrypt_v2
+from st2common.util.crypto import pkcs5_pad
+from st2common.util.crypto import pkcs5_unpad
+from st2common.util.crypto import Base64WSEncode
+from st2common.util.crypto import Base64WSDecode
 
 from st2tests.fixturesloader import get_fixtures_base_path
 
+from tests.unit.crypto_compat import keyczar_symmetric_decrypt
+from tests.unit.crypto_compat import keyczar_symmetric_encrypt
+
 __all__ = [
     'CryptoUtilsTestCase',
     'CryptoUtilsKeyczarCompatibilityTestCase'
@@ -46,6 +63,12 @@ __all__ = [
 
 KEY_FIXTURES_PATH = os.path.join(get_fixtures_base_path(), 'keyczar_keys/')
 
+# Value encrypted using keyczar_keys/one.json key in legacy (keyczar compatible) hex notation
+LEGACY_PLAINTEXT = u'legacy secret £'
+LEGACY_HEX_CIPHERTEXT = ('3030303030AE688F9CA396FF17A767B59EC6E2220E77B069'
+                         '9915EE45A1266784D174A2383CAD76B1C5693238CEE4DDF3'
+                         'C85AF6FAE428009135D5E1267CF1CA2F10DBB874F35374F841')
+
 
 class CryptoUtilsTestCase(TestCase):
 
@@ -54,6 +77,20 @@ class CryptoUtilsTestCase(TestCase):
         super(CryptoUtilsTestCase, cls).setUpClass()
         CryptoUtilsTestCase.test_crypto_key = AESKey.generate()
 
+    def test_key_generation(self):
+        aes_key = AESKey.generate(key_size=128)
+        self.assertEqual(len(aes_key.aes_key_bytes), 16)
+        self.assertEqual(len(aes_key.hmac_key_bytes), 16)
+        self.assertEqual(aes_key.size, 128)
+
+        aes_key = AESKey.generate()
+        self.assertEqual(len(aes_key.aes_key_bytes), 32)
+        self.assertEqual(len(aes_key.hmac_key_bytes), 32)
+        self.assertEqual(aes_key.size, 256)
+
+        expected_msg = 'Unsafe key size: 64'
+        self.assertRaisesRegexp(ValueError, expected_msg, AESKey.generate, key_size=64)
+
     def test_symmetric_encrypt_decrypt_short_string_needs_to_be_padded(self):
         original = u'a'
         crypto = symmetric_encrypt(CryptoUtilsTestCase.test_crypto_key, original)
@@ -94,6 +131,35 @@ class CryptoUtilsTestCase(TestCase):
             self.assertTrue(crypto not in cryptos)
             cryptos.add(crypto)
 
+    def test_pkcs5_pad_unpad(self):
+        for length in range(0, 40):
+            data = b'a' * length
+            padded = pkcs5_pad(data)
+
+            self.assertEqual(len(padded) % 16, 0)
+            self.assertTrue(len(data) < len(padded) <= len(data) + 16)
+            self.assertEqual(pkcs5_unpad(padded), data)
+
+    def test_base64_ws_encode_decode(self):
+        for length in range(0, 10):
+            data = os.urandom(length)
+            encoded = Base64WSEncode(data)
+
+            self.assertTrue(isinstance(encoded, six.text_type))
+            self.assertFalse('=' in encoded)
+            self.assertEqual(Base64WSDecode(encoded), data)
+            self.assertEqual(Base64WSDecode(encoded.encode('utf-8')), data)
+
+        self.assertEqual(Base64WSEncode(u'hello'), 'aGVsbG8')
+        self.assertEqual(Base64WSEncode(b'hello'), 'aGVsbG8')
+
+        # Whitespace is ignored
+        self.assertEqual(Base64WSDecode(' aGVs\nbG8 \r\n'), b'hello')
+        self.assertEqual(Base64WSDecode(b'aGVs\tbG8'), b'hello')
+
+        expected_msg = 'Base64 decoding errors'
+        self.assertRaisesRegexp(ValueError, expected_msg, Base64WSDecode, 'aGVsb')
+
     def test_decrypt_ciphertext_is_too_short(self):
         aes_key = AESKey.generate()
         plaintext = 'hello world ponies 1'
@@ -104,7 +170,7 @@ class CryptoUtilsTestCase(TestCase):
         self.assertEqual(decrypted, plaintext)
 
         # Corrupt / shortern the encrypted data
-        encrypted_malformed = binascii.unhexlify(encrypted)
+        encrypted_malformed = base64.b64decode(encrypted[len(HMAC_SHA256_CIPHERTEXT_PREFIX):])
         header = encrypted_malformed[:KEYCZAR_HEADER_SIZE]
         encrypted_malformed = encrypted_malformed[KEYCZAR_HEADER_SIZE:]
 
@@ -113,7 +179,8 @@ class CryptoUtilsTestCase(TestCase):
 
         # Add back header
         encrypted_malformed = header + encrypted_malformed
-        encrypted_malformed = binascii.hexlify(encrypted_malformed)
+        encrypted_malformed = (HMAC_SHA256_CIPHERTEXT_PREFIX +
+                               base64.b64encode(encrypted_malformed))
 
         # Verify corrupted value results in an excpetion
         expected_msg = 'Invalid or malformed ciphertext'
@@ -130,16 +197,118 @@ class CryptoUtilsTestCase(TestCase):
         self.assertEqual(decrypted, plaintext)
 
         # Corrupt the HMAC signature (last part is the HMAC signature)
-        encrypted_malformed = binascii.unhexlify(encrypted)
+        encrypted_malformed = base64.b64decode(encrypted[len(HMAC_SHA256_CIPHERTEXT_PREFIX):])
         encrypted_malformed = encrypted_malformed[:-3]
         encrypted_malformed += b'abc'
-        encrypted_malformed = binascii.hexlify(encrypted_malformed)
+        encrypted_malformed = (HMAC_SHA256_CIPHERTEXT_PREFIX +
+                               base64.b64encode(encrypted_malformed))
 
         # Verify corrupted value results in an excpetion
         expected_msg = 'Signature did not match digest'
         self.assertRaisesRegexp(InvalidSignature, expected_msg, cryptography_symmetric_decrypt,
                                 aes_key, encrypted_malformed)
 
+    def test_encrypt_output_is_base64_encoded_and_signed_using_sha256(self):
+        aes_key = AESKey.generate()
+        plaintext = 'hello world ponies 3'
+        encrypted = cryptography_symmetric_encrypt(aes_key, plaintext)
+
+        self.assertTrue(encrypted.startswith(HMAC_SHA256_CIPHERTEXT_PREFIX))
+
+        msg_bytes = base64.b64decode(encrypted[len(HMAC_SHA256_CIPHERTEXT_PREFIX):])
+        self.assertEqual(msg_bytes[:KEYCZAR_HEADER_SIZE], b'00000')
+
+        # header + IV + single padded block + signature
+        self.assertEqual(len(msg_bytes), KEYCZAR_HEADER_SIZE + 16 + 32 + HMAC_SHA256_HLEN)
+
+    def test_decrypt_legacy_hex_encoded_ciphertext(self):
+        # Value has been encrypted using a version which still used hex notation
+        key_path = os.path.join(KEY_FIXTURES_PATH, 'one.json')
+        aes_key = read_crypto_key(key_path=key_path)
+
+        encrypted = LEGACY_HEX_CIPHERTEXT
+        self.assertEqual(cryptography_symmetric_decrypt(aes_key, encrypted), LEGACY_PLAINTEXT)
+        self.assertEqual(symmetric_decrypt(aes_key, encrypted), LEGACY_PLAINTEXT)
+
+    @mock.patch('st2common.util.crypto.AESGCM', mock.Mock(wraps=AESGCM))
+    @mock.patch('st2common.util.crypto.algorithms', mock.Mock(AES=mock.Mock(wraps=algorithms.AES)))
+    @mock.patch('st2common.util.crypto.hmac', mock.Mock(HMAC=mock.Mock(wraps=hmac.HMAC)))
+    def test_cipher_objects_are_created_lazily_and_reused(self):
+        # Key loaded for a single decrypt operation (e.g. decrypt_kv filter) should only set up
+        # cipher objects which are needed for that operation
+        key_path = os.path.join(KEY_FIXTURES_PATH, 'one.json')
+        aes_key = read_crypto_key(key_path=key_path)
+        self.assertFalse(crypto.AESGCM.called)
+        self.assertFalse(crypto.algorithms.AES.called)
+        self.assertFalse(crypto.hmac.HMAC.called)
+
+        # Legacy value only needs SHA1 HMAC
+        self.assertEqual(symmetric_decrypt(aes_key, LEGACY_HEX_CIPHERTEXT), LEGACY_PLAINTEXT)
+        self.assertFalse(crypto.AESGCM.called)
+        self.assertEqual(crypto.algorithms.AES.call_count, 1)
+        self.assertEqual(crypto.hmac.HMAC.call_count, 1)
+
+        # Cipher objects are created once per key
+        encrypted = symmetric_encrypt(aes_key, 'hello world')
+        self.assertEqual(symmetric_decrypt(aes_key, encrypted), 'hello world')
+        self.assertEqual(symmetric_decrypt(aes_key, LEGACY_HEX_CIPHERTEXT), LEGACY_PLAINTEXT)
+        self.assertEqual(crypto.AESGCM.call_count, 1)
+        self.assertEqual(crypto.algorithms.AES.call_count, 1)
+
+        encrypted = cryptography_symmetric_encrypt(aes_key, 'hello world')
+        self.assertEqual(symmetric_decrypt(aes_key, encrypted), 'hello world')
+        self.assertEqual(symmetric_decrypt(aes_key, LEGACY_HEX_CIPHERTEXT), LEGACY_PLAINTEXT)
+        self.assertEqual(crypto.algorithms.AES.call_count, 1)
+        self.assertEqual(crypto.hmac.HMAC.call_count, 2)
+
+    def test_symmetric_encrypt_uses_aes_gcm(self):
+        aes_key = AESKey.generate()
+        plaintext = 'hello world ponies 4'
+        encrypted = symmetric_encrypt(aes_key, plaintext)
+
+        self.assertTrue(encrypted.startswith(AES_GCM_CIPHERTEXT_PREFIX))
+        self.assertEqual(cryptography_symmetric_decrypt_v2(aes_key, encrypted), plaintext)
+
+    def test_symmetric_decrypt_keyczar_compatible_format(self):
+        aes_key = AESKey.generate()
+        plaintext = 'hello world ponies 5'
+        encrypted = cryptography_symmetric_encrypt(aes_key, plaintext)
+
+        self.assertEqual(symmetric_decrypt(aes_key, encrypted), plaintext)
+
+    def test_aes_gcm_ciphertext_contains_no_separate_signature(self):
+        aes_key = AESKey.generate()
+        plaintext = b'a' * 33
+        encrypted = cryptography_symmetric_encrypt_v2(aes_key, plaintext)
+
+        # nonce + ciphertext (no padding is needed) + authentication tag
+        data_bytes = base64.b64decode(encrypted[len(AES_GCM_CIPHERTEXT_PREFIX):])
+        self.assertEqual(len(data_bytes), AES_GCM_NONCE_SIZE + len(plaintext) + 16)
+
+    def test_exception_is_thrown_on_invalid_aes_gcm_tag(self):
+        aes_key = AESKey.generate()
+        plaintext = 'hello world ponies 6'
+        encrypted = cryptography_symmetric_encrypt_v2(aes_key, plaintext)
+
+        # Corrupt the authentication tag (last part is the authentication tag)
+        encrypted_malformed = base64.b64decode(encrypted[len(AES_GCM_CIPHERTEXT_PREFIX):])
+        encrypted_malformed = encrypted_malformed[:-3]
+        encrypted_malformed += b'abc'
+        encrypted_malformed = AES_GCM_CIPHERTEXT_PREFIX + base64.b64encode(encrypted_malformed)
+
+        self.assertRaises(InvalidTag, symmetric_decrypt, aes_key, encrypted_malformed)
+
+        # Decryption with a different key should also fail
+        self.assertRaises(InvalidTag, symmetric_decrypt, AESKey.generate(), encrypted)
+
+    def test_aes_gcm_ciphertext_is_too_short(self):
+        aes_key = AESKey.generate()
+        encrypted_malformed = AES_GCM_CIPHERTEXT_PREFIX + base64.b64encode(b'a' * 20)
+
+        expected_msg = 'Invalid or malformed ciphertext'
+        self.assertRaisesRegexp(ValueError, expected_msg, cryptography_symmetric_decrypt_v2,
+                                aes_key, encrypted_malformed)
+
 
 class CryptoUtilsKeyczarCompatibilityTestCase(TestCase):
     """
@@ -227,6 +396,11 @@ class CryptoUtilsKeyczarCompatibilityTestCase(TestCase):
 
             self.assertEqual(decrypted, plaintext)
 
+            encrypted = cryptography_symmetric_encrypt_v2(key, plaintext)
+            decrypted = cryptography_symmetric_decrypt_v2(key, encrypted)
+
+            self.assertEqual(decrypted, plaintext)
+
     @unittest2.skipIf(six.PY3, 'keyczar doesn\'t work under Python 3')
     def test_symmetric_encrypt_decrypt_roundtrips_1(self):
         encrypt_keys = [
@@ -249,8 +423,8 @@ class CryptoUtilsKeyczarCompatibilityTestCase(TestCase):
 
         plaintext = 'hello world test dummy 8 9 5 1 bar2'
 
-        # Verify that round trips work and that cryptography based primitives are fully compatible
-        # with keyczar format
+        # Verify that round trips work and that cryptography based primitives can decrypt values
+        # in keyczar format
 
         count = 0
         for key in encrypt_keys:
@@ -259,11 +433,11 @@ class CryptoUtilsKeyczarCompatibilityTestCase(TestCase):
 
             self.assertNotEqual(data_enc_keyczar, data_enc_cryptography)
 
+            # NOTE: Values encrypted using cryptography_symmetric_encrypt are signed using SHA256
+            # HMAC so keyczar can't decrypt them
             data_dec_keyczar_keyczar = keyczar_symmetric_decrypt(key, data_enc_keyczar)
-            data_dec_keyczar_cryptography = keyczar_symmetric_decrypt(key, data_enc_cryptography)
 
             self.assertEqual(data_dec_keyczar_keyczar, plaintext)
-            self.assertEqual(data_dec_keyczar_cryptography, plaintext)
 
             data_dec_cryptography_cryptography = cryptography_symmetric_decrypt(key,
                 data_enc_cryptography)
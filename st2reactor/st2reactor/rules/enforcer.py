@@ -17,6 +17,7 @@ from __future__ import absolute_import
 import sys
 import json
 import traceback
+import logging as stdlib_logging
 
 import six
 
@@ -46,15 +47,32 @@ __all__ = [
 
 LOG = logging.getLogger('st2reactor.ruleenforcement.enforce')
 
-EXEC_KICKED_OFF_STATES = [action_constants.LIVEACTION_STATUS_SCHEDULED,
-                          action_constants.LIVEACTION_STATUS_REQUESTED]
+EXEC_KICKED_OFF_STATES = frozenset([action_constants.LIVEACTION_STATUS_SCHEDULED,
+                                    action_constants.LIVEACTION_STATUS_REQUESTED])
 
 
 class RuleEnforcer(object):
+    __slots__ = (
+        'trigger_instance',
+        'rule',
+        '_trigger_instance_id',
+        '_action_ref',
+        '_action_params',
+        '_rule_spec'
+    )
+
     def __init__(self, trigger_instance, rule):
         self.trigger_instance = trigger_instance
         self.rule = rule
 
+        # Attribute access on mongoengine documents is relatively expensive so values which are
+        # used multiple times during enforcement are retrieved only once in enforce(). They are
+        # not retrieved here so that errors are recorded as a failed rule enforcement.
+        self._trigger_instance_id = None
+        self._action_ref = None
+        self._action_params = None
+        self._rule_spec = None
+
     def get_action_execution_context(self, action_db, trace_context=None):
         context = {
             'trigger_instance': reference.get_ref_from_model(self.trigger_instance),
@@ -85,9 +103,11 @@ class RuleEnforcer(object):
         return resolved_params
 
     def enforce(self):
-        rule_spec = {'ref': self.rule.ref, 'id': str(self.rule.id), 'uid': self.rule.uid}
-        enforcement_db = RuleEnforcementDB(trigger_instance_id=str(self.trigger_instance.id),
-                                           rule=rule_spec)
+        self._trigger_instance_id = str(self.trigger_instance.id)
+        self._rule_spec = {'ref': self.rule.ref, 'id': str(self.rule.id), 'uid': self.rule.uid}
+
+        enforcement_db = RuleEnforcementDB(trigger_instance_id=self._trigger_instance_id,
+                                           rule=self._rule_spec)
         extra = {
             'trigger_instance_db': self.trigger_instance,
             'rule_db': self.rule
@@ -109,9 +129,11 @@ class RuleEnforcer(object):
 
         # pylint: disable=no-member
         if not execution_db or execution_db.status not in EXEC_KICKED_OFF_STATES:
+            # NOTE: Rule action is not required so it could be missing on a malformed rule
+            action_ref = self.rule.action.ref if self.rule.action else None
             LOG.audit('Rule enforcement failed. Execution of Action %s failed. '
                       'TriggerInstance: %s and Rule: %s',
-                      self.rule.action.ref, self.trigger_instance, self.rule,
+                      action_ref, self.trigger_instance, self.rule,
                       extra=extra)
         else:
             LOG.audit('Rule enforced. Execution %s, TriggerInstance %s and Rule %s.',
@@ -120,8 +142,11 @@ class RuleEnforcer(object):
         return execution_db
 
     def _do_enforce(self):
+        self._action_ref = self.rule.action['ref']
+        self._action_params = self.rule.action.parameters
+
         # TODO: Refactor this to avoid additional lookup in cast_params
-        action_ref = self.rule.action['ref']
+        action_ref = self._action_ref
 
         # Verify action referenced in the rule exists in the database
         action_db = action_utils.get_action_by_ref(action_ref)
@@ -130,14 +155,17 @@ class RuleEnforcer(object):
 
         runnertype_db = action_utils.get_runnertype_by_name(action_db.runner_type['name'])
 
-        params = self.rule.action.parameters
-        LOG.info('Invoking action %s for trigger_instance %s with params %s.',
-                 self.rule.action.ref, self.trigger_instance.id,
-                 json.dumps(params))
+        params = self._action_params
+
+        # NOTE: Parameters can be large so we avoid serializing them if the message won't be logged
+        if LOG.isEnabledFor(stdlib_logging.INFO):
+            LOG.info('Invoking action %s for trigger_instance %s with params %s.',
+                     action_ref, self._trigger_instance_id,
+                     json.dumps(params))
 
         # update trace before invoking the action.
         trace_context = self._update_trace()
-        LOG.debug('Updated trace %s with rule %s.', trace_context, self.rule.id)
+        LOG.debug('Updated trace %s with rule %s.', trace_context, self._rule_spec['id'])
 
         context, additional_contexts = self.get_action_execution_context(
             action_db=action_db,
@@ -154,8 +182,8 @@ class RuleEnforcer(object):
         trace_db = None
         try:
             trace_db = trace_service.get_trace_db_by_trigger_instance(self.trigger_instance)
-        except:
-            LOG.exception('No Trace found for TriggerInstance %s.', self.trigger_instance.id)
+        except Exception:
+            LOG.exception('No Trace found for TriggerInstance %s.', self._trigger_instance_id)
             return None
 
         # This would signify some sort of coding error so assert.
@@ -166,12 +194,12 @@ class RuleEnforcer(object):
             rules=[
                 trace_service.get_trace_component_for_rule(self.rule, self.trigger_instance)
             ])
-        return vars(TraceContext(id_=str(trace_db.id), trace_tag=trace_db.trace_tag))
+        return TraceContext(id_=str(trace_db.id), trace_tag=trace_db.trace_tag).to_dict()
 
     def _update_enforcement(self, enforcement_db):
         try:
             RuleEnforcement.add_or_update(enforcement_db)
-        except:
+        except Exception:
             extra = {'enforcement_db': enforcement_db}
             LOG.exception('Failed writing enforcement model to db.', extra=extra)
 
@@ -182,13 +210,15 @@ class RuleEnforcer(object):
 
         :type action_exec_spec: :class:`ActionExecutionSpecDB`
 
+        :param runnertype_db: Runner type of the action.
+        :type runnertype_db: :class:`RunnerTypeDB`
+
         :param params: Partially rendered parameters to execute the action with.
         :type params: ``dict``
 
         :rtype: :class:`LiveActionDB` on successful scheduling, None otherwise.
         """
         action_ref = action_db.ref
-        runnertype_db = action_utils.get_runnertype_by_name(action_db.runner_type['name'])
 
         liveaction_db = LiveActionDB(action=action_ref, context=context, parameters=params)
 
@@ -14,6 +14,8 @@
 
 from __future__ import absolute_import
 
+import copy
+
 import mock
 
 from st2common.constants import action as action_constants
@@ -30,6 +32,7 @@ from st2common.persistence.rule_enforcement import RuleEnforcement
 from st2common.services import action as action_service
 from st2common.bootstrap import runnersregistrar as runners_registrar
 from st2common.util import casts
+from st2common.util import action_db as action_utils
 from st2common.util import reference
 from st2common.util import date as date_utils
 from st2reactor.rules.enforcer import RuleEnforcer
@@ -231,6 +234,51 @@ class RuleEnforcerTestCase(BaseRuleEnforcerTestCase):
 
         casts.CASTS['string'] = casts._cast_string
 
+    @mock.patch.object(action_service, 'request', mock.MagicMock(
+        return_value=(MOCK_LIVEACTION, MOCK_EXECUTION)))
+    @mock.patch.object(RuleEnforcement, 'add_or_update', mock.MagicMock())
+    @mock.patch.object(action_utils, 'get_runnertype_by_name',
+                       mock.MagicMock(wraps=action_utils.get_runnertype_by_name))
+    def test_ruleenforcement_and_scheduled_action(self):
+        rule = self.models['rules']['rule2.yaml']
+        enforcer = RuleEnforcer(MOCK_TRIGGER_INSTANCE, rule)
+        execution_db = enforcer.enforce()
+        self.assertTrue(execution_db is not None)
+
+        # Verify action referenced in the rule has been scheduled
+        live_action_db = action_service.request.call_args[0][0]
+        self.assertEqual(live_action_db.action, rule.action.ref)
+        self.assertEqual(live_action_db.parameters['strtype'], 't1_p_v')
+
+        # Runner type should only be retrieved once per enforcement
+        self.assertEqual(action_utils.get_runnertype_by_name.call_count, 1)
+
+        # Verify enforcement has been recorded
+        enforcement_db = RuleEnforcement.add_or_update.call_args[0][0]
+        self.assertEqual(enforcement_db.status, RULE_ENFORCEMENT_STATUS_SUCCEEDED)
+        self.assertEqual(enforcement_db.trigger_instance_id, str(MOCK_TRIGGER_INSTANCE.id))
+        self.assertEqual(enforcement_db.execution_id, str(MOCK_EXECUTION.id))
+        self.assertEqual(enforcement_db.rule.ref, rule.ref)
+        self.assertEqual(enforcement_db.rule.id, str(rule.id))
+        self.assertEqual(enforcement_db.rule.uid, rule.uid)
+
+    @mock.patch.object(action_service, 'request', mock.MagicMock(
+        return_value=(MOCK_LIVEACTION, MOCK_EXECUTION)))
+    @mock.patch.object(RuleEnforcement, 'add_or_update', mock.MagicMock())
+    def test_ruleenforcement_create_on_fail_rule_without_action(self):
+        # Malformed rule should result in a failed enforcement and not in an exception
+        rule = copy.deepcopy(self.models['rules']['rule1.yaml'])
+        rule.action = None
+
+        enforcer = RuleEnforcer(MOCK_TRIGGER_INSTANCE, rule)
+        execution_db = enforcer.enforce()
+
+        self.assertTrue(execution_db is None)
+        self.assertFalse(action_service.request.called)
+        self.assertTrue(RuleEnforcement.add_or_update.called)
+        self.assertEqual(RuleEnforcement.add_or_update.call_args[0][0].status,
+                         RULE_ENFORCEMENT_STATUS_FAILED)
+
     @mock.patch.object(action_service, 'request', mock.MagicMock(
         side_effect=ValueError(FAILURE_REASON)))
     @mock.patch.object(RuleEnforcement, 'add_or_update', mock.MagicMock())